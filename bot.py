@@ -1,8 +1,10 @@
+import asyncio
 import logging
-import os
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ChatAction
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, 
+    Application, AIORateLimiter, CommandHandler, MessageHandler,
     filters, ContextTypes
 )
 
@@ -20,45 +22,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class TelegramBot:
-    def __init__(self):
-        """Initialize the bot with all components"""
-        self.application = Application.builder().token(config.BOT_TOKEN).build()
-        self.bot = self.application.bot
-        
-        # Initialize components
-        self.gemini_ai = GeminiAI()
-        self.content_moderator = ContentModerator()
-        self.file_manager = FileManager(self.bot)
-        self.url_scanner = URLScanner()
-        self.user_manager = UserManager(self.bot)
-        
-        self.setup_handlers()
+# Filter combination built once instead of per handler registration
+_TEXT_FILTER = filters.TEXT & ~filters.COMMAND
 
-    def setup_handlers(self):
-        """Setup all command and message handlers"""
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(CommandHandler("admin", self.admin_command))
-        self.application.add_handler(CommandHandler("ban", self.ban_command))
-        self.application.add_handler(CommandHandler("unban", self.unban_command))
-        self.application.add_handler(CommandHandler("addadmin", self.add_admin_command))
-        self.application.add_handler(CommandHandler("deladmin", self.del_admin_command))
-        self.application.add_handler(CommandHandler("scan", self.scan_url_command))
-        self.application.add_handler(CommandHandler("contact", self.contact_command))
-        
-        # Message handlers
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text_message))
-        self.application.add_handler(MessageHandler(filters.Document.ALL, self.handle_document))
-        self.application.add_handler(MessageHandler(filters.PHOTO, self.handle_photo))
-        
-        # Callback handlers
-        from telegram.ext import CallbackQueryHandler
-        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
-
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /start command"""
-        welcome_text = f"""
+# Static reply texts, formatted once at import since the owner name
+# never changes after startup
+WELCOME_TEXT = f"""
 🤖 **Welcome to {config.BOT_OWNER_NAME}'s Advanced Bot!**
 
 🔥 **Features:**
@@ -81,12 +50,8 @@ class TelegramBot:
 
 Ready to assist you! 🚀
         """
-        
-        await update.message.reply_text(welcome_text)
 
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /help command"""
-        help_text = """
+HELP_TEXT = f"""
 🆘 **Bot Commands & Features**
 
 **🤖 AI Assistant:**
@@ -97,7 +62,7 @@ Ready to assist you! 🚀
 
 **👑 Admin Commands:**
 • `/ban <user_id>` - Ban a user
-• `/unban <user_id>` - Unban a user  
+• `/unban <user_id>` - Unban a user
 • `/addadmin <user_id>` - Add admin (Owner only)
 • `/deladmin <user_id>` - Remove admin (Owner only)
 
@@ -113,14 +78,219 @@ Ready to assist you! 🚀
 
 Made with ❤️ by {config.BOT_OWNER_NAME}
         """
+
+CONTACT_TEXT = f"""
+📞 **Developer & Support Contact**
+
+👨‍💻 **Developer:** {config.BOT_OWNER_NAME}
+📱 **Telegram:** @Sathishkumar33
+📧 **Email:** Mraprguild@gmail.com
+
+🆘 **Support Available For:**
+• Bot issues & troubleshooting
+• Feature requests & suggestions
+• Technical support & questions
+• Custom modifications & updates
+
+💬 **Response Time:** Usually within 24 hours
+🤝 **Professional Support:** Available for all users
+
+Feel free to reach out anytime for assistance!
+        """
+
+class TelegramBot:
+    def __init__(self):
+        """Initialize the bot with all components"""
+        # Keep-alive pool for Bot API calls so sends amortize the TLS
+        # handshake instead of paying it per message, with getUpdates
+        # long-polling on its own connections
+        self.application = (
+            Application.builder()
+            .token(config.BOT_TOKEN)
+            .connection_pool_size(32)
+            .pool_timeout(30)
+            .connect_timeout(10)
+            .read_timeout(30)
+            .write_timeout(120)
+            .get_updates_connection_pool_size(1)
+            .get_updates_pool_timeout(60)
+            # Pace sends inside Telegram's 30 msg/s global and
+            # 20 msg/min per-group ceilings instead of eating 429s
+            .rate_limiter(AIORateLimiter(
+                overall_max_rate=30, overall_time_period=1,
+                group_max_rate=20, group_time_period=60
+            ))
+            .post_shutdown(self._close_http)
+            .build()
+        )
+        self.bot = self.application.bot
         
-        await update.message.reply_text(help_text)
+        # One pooled HTTP client shared by every component that talks
+        # to the outside, so requests reuse keep-alive connections
+        self.http = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+        )
+
+        # Initialize components
+        self.gemini_ai = GeminiAI()
+        self.content_moderator = ContentModerator(self.gemini_ai)
+        self.file_manager = FileManager(self.bot, http=self.http)
+        self.url_scanner = URLScanner(http=self.http)
+        self.user_manager = UserManager(self.bot)
+
+        # Per-chat reply queues so bursts of status messages coalesce
+        # into a single send (or edit) instead of one API call each
+        self.send_flush_interval = 0.25
+        self.send_queue_max = 10
+        self._send_queues = {}
+        self._send_tasks = {}
+
+        # Per-chat dispatch queues: updates for one chat run in order on
+        # their own worker so a slow Gemini call can't stall other chats
+        self.max_concurrent_handlers = 32
+        self._chat_workers = {}
+        self._worker_tasks = {}
+        self._dispatch_semaphore = None
+
+        self.setup_handlers()
+
+    async def _close_http(self, application):
+        """Release the pooled HTTP connections on shutdown"""
+        await self.http.aclose()
+
+    def per_chat(self, handler):
+        """Wrap a handler so it runs on its chat's dispatch worker"""
+        async def dispatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            chat = update.effective_chat
+            if chat is None:
+                await handler(update, context)
+                return
+
+            if self._dispatch_semaphore is None:
+                self._dispatch_semaphore = asyncio.Semaphore(self.max_concurrent_handlers)
+
+            queue = self._chat_workers.get(chat.id)
+            if queue is None:
+                queue = asyncio.Queue()
+                self._chat_workers[chat.id] = queue
+                self._worker_tasks[chat.id] = asyncio.create_task(self._chat_loop(chat.id))
+
+            # Enqueue and return so polling can advance to the next update
+            await queue.put((handler, update, context))
+
+        return dispatch
+
+    async def _chat_loop(self, chat_id: int):
+        """Run queued handlers for one chat serially"""
+        queue = self._chat_workers[chat_id]
+        while True:
+            handler, update, context = await queue.get()
+            async with self._dispatch_semaphore:
+                try:
+                    await handler(update, context)
+                except Exception as e:
+                    logger.error(f"Handler error in chat {chat_id}: {e}")
+
+    async def enqueue_reply(self, message, text: str, kind: str = "status"):
+        """Queue a reply for batched sending to the message's chat"""
+        chat_id = message.chat_id
+        queue = self._send_queues.get(chat_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.send_queue_max)
+            self._send_queues[chat_id] = queue
+            self._send_tasks[chat_id] = asyncio.create_task(self._drain_send_queue(chat_id))
+
+        try:
+            queue.put_nowait((message, text, kind))
+        except asyncio.QueueFull:
+            # Evict the oldest queued status update - final replies
+            # must survive the overflow, progress lines are expendable
+            backlog = []
+            while not queue.empty():
+                backlog.append(queue.get_nowait())
+            for i, (_, _, queued_kind) in enumerate(backlog):
+                if queued_kind != "final":
+                    del backlog[i]
+                    backlog.append((message, text, kind))
+                    break
+            else:
+                # Only finals queued: drop the incoming status, or the
+                # oldest final when the newcomer is itself a final
+                if kind == "final":
+                    backlog = backlog[1:] + [(message, text, kind)]
+            for item in backlog:
+                queue.put_nowait(item)
+
+    async def _drain_send_queue(self, chat_id: int):
+        """Flush one chat's reply queue, merging bursts into single sends"""
+        queue = self._send_queues[chat_id]
+        progress_msg = None
+
+        while True:
+            message, text, kind = await queue.get()
+            texts = [text]
+            kinds = {kind}
+
+            # Merge anything else queued within the flush window
+            while True:
+                try:
+                    _, more_text, more_kind = await asyncio.wait_for(
+                        queue.get(), timeout=self.send_flush_interval
+                    )
+                    texts.append(more_text)
+                    kinds.add(more_kind)
+                except asyncio.TimeoutError:
+                    break
+
+            merged = "\n".join(texts)
+
+            try:
+                if "final" in kinds or progress_msg is None:
+                    progress_msg = await message.reply_text(merged)
+                else:
+                    # Update the existing progress message in place
+                    await progress_msg.edit_text(merged)
+
+                if "final" in kinds:
+                    progress_msg = None
+            except Exception as e:
+                logger.error(f"Batched send error for chat {chat_id}: {e}")
+
+    def setup_handlers(self):
+        """Setup all command and message handlers"""
+        self.application.add_handler(CommandHandler("start", self.per_chat(self.start_command)))
+        self.application.add_handler(CommandHandler("help", self.per_chat(self.help_command)))
+        self.application.add_handler(CommandHandler("admin", self.per_chat(self.admin_command)))
+        self.application.add_handler(CommandHandler("ban", self.per_chat(self.ban_command)))
+        self.application.add_handler(CommandHandler("unban", self.per_chat(self.unban_command)))
+        self.application.add_handler(CommandHandler("addadmin", self.per_chat(self.add_admin_command)))
+        self.application.add_handler(CommandHandler("deladmin", self.per_chat(self.del_admin_command)))
+        self.application.add_handler(CommandHandler("scan", self.per_chat(self.scan_url_command)))
+        self.application.add_handler(CommandHandler("contact", self.per_chat(self.contact_command)))
+
+        # Message handlers
+        self.application.add_handler(MessageHandler(_TEXT_FILTER, self.per_chat(self.handle_text_message)))
+        self.application.add_handler(MessageHandler(filters.Document.ALL, self.per_chat(self.handle_document)))
+        self.application.add_handler(MessageHandler(filters.PHOTO, self.per_chat(self.handle_photo)))
+
+        # Callback handlers
+        from telegram.ext import CallbackQueryHandler
+        self.application.add_handler(CallbackQueryHandler(self.per_chat(self.handle_callback)))
+
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /start command"""
+        await update.message.reply_text(WELCOME_TEXT)
+
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /help command"""
+        await update.message.reply_text(HELP_TEXT)
 
     async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /admin command"""
         user_id = update.effective_user.id
         
-        if not await self.user_manager.is_admin(user_id):
+        if not self.user_manager.is_admin(user_id):
             await update.message.reply_text("❌ You don't have admin permissions!")
             return
         
@@ -134,7 +304,7 @@ Made with ❤️ by {config.BOT_OWNER_NAME}
 
     async def ban_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /ban command"""
-        if not await self.user_manager.is_admin(update.effective_user.id):
+        if not self.user_manager.is_admin(update.effective_user.id):
             await update.message.reply_text("❌ You don't have admin permissions!")
             return
         
@@ -158,7 +328,7 @@ Made with ❤️ by {config.BOT_OWNER_NAME}
 
     async def unban_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /unban command"""
-        if not await self.user_manager.is_admin(update.effective_user.id):
+        if not self.user_manager.is_admin(update.effective_user.id):
             await update.message.reply_text("❌ You don't have admin permissions!")
             return
         
@@ -182,7 +352,7 @@ Made with ❤️ by {config.BOT_OWNER_NAME}
 
     async def add_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /addadmin command"""
-        if not await self.user_manager.is_owner(update.effective_user.id):
+        if not self.user_manager.is_owner(update.effective_user.id):
             await update.message.reply_text("❌ Only the owner can add admins!")
             return
         
@@ -204,7 +374,7 @@ Made with ❤️ by {config.BOT_OWNER_NAME}
 
     async def del_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /deladmin command"""
-        if not await self.user_manager.is_owner(update.effective_user.id):
+        if not self.user_manager.is_owner(update.effective_user.id):
             await update.message.reply_text("❌ Only the owner can remove admins!")
             return
         
@@ -244,26 +414,7 @@ Made with ❤️ by {config.BOT_OWNER_NAME}
 
     async def contact_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /contact command"""
-        contact_text = f"""
-📞 **Developer & Support Contact**
-
-👨‍💻 **Developer:** {config.BOT_OWNER_NAME}
-📱 **Telegram:** @Sathishkumar33
-📧 **Email:** Mraprguild@gmail.com
-
-🆘 **Support Available For:**
-• Bot issues & troubleshooting
-• Feature requests & suggestions  
-• Technical support & questions
-• Custom modifications & updates
-
-💬 **Response Time:** Usually within 24 hours
-🤝 **Professional Support:** Available for all users
-
-Feel free to reach out anytime for assistance!
-        """
-        
-        await update.message.reply_text(contact_text)
+        await update.message.reply_text(CONTACT_TEXT)
 
     async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle text messages"""
@@ -274,44 +425,54 @@ Feel free to reach out anytime for assistance!
             
         user_id = update.effective_user.id
         
-        # Check for URLs in message and scan automatically
-        urls = self.url_scanner.extract_urls_from_text(text)
+        # Check for URLs in message and scan automatically; trust
+        # Telegram's entity parsing to skip the regex on plain chat
+        entities = update.message.entities or []
+        if any(entity.type in ("url", "text_link") for entity in entities):
+            urls = self.url_scanner.extract_urls_from_text(text)
+        else:
+            urls = []
         if urls:
             # Send scanning notification
-            scan_msg = await update.message.reply_text("🔍 Automatically scanning URLs for security...")
-            
+            await self.enqueue_reply(update.message, "🔍 Automatically scanning URLs for security...")
+
             # Scan URLs and take action
             urls_blocked = await self.handle_urls_in_message(update, urls)
-            
+
             if urls_blocked:
-                # If URLs were blocked, don't process the message further
-                await scan_msg.delete()
+                # handle_urls_in_message already posted the warning;
+                # just stop processing the (now deleted) message
                 return
             else:
                 # URLs are safe, update the scan message
-                await scan_msg.edit_text("✅ URLs scanned - all safe!")
-        
-        # Content moderation
-        moderation_result = await self.content_moderator.check_text_content(text)
-        
-        if not moderation_result["is_safe"]:
+                await self.enqueue_reply(update.message, "✅ URLs scanned - all safe!")
+
+        # A typing indicator acks the message without persisting any
+        # chat clutter; it overlaps with the Gemini wait and expires on
+        # its own
+        asyncio.create_task(
+            context.bot.send_chat_action(update.effective_chat.id, ChatAction.TYPING)
+        )
+
+        # Moderation verdict and AI reply come back from one fused
+        # Gemini call instead of two round trips
+        try:
+            result = await self.content_moderator.check_and_respond(text)
+        except Exception as e:
+            await self.enqueue_reply(update.message, "Sorry, I encountered an error processing your request.", kind="final")
+            return
+
+        if not result["is_safe"]:
             # Delete message and warn user
             try:
                 await update.message.delete()
-                warning_text = f"⚠️ Message removed due to: {', '.join(moderation_result['violations'])}"
-                await update.message.reply_text(warning_text)
+                warning_text = f"⚠️ Message removed due to: {', '.join(result['violations'])}"
+                await self.enqueue_reply(update.message, warning_text, kind="final")
             except:
                 pass
             return
-        
-        # Generate AI response
-        await update.message.reply_text("🤖 Thinking...")
-        
-        try:
-            ai_response = await self.gemini_ai.generate_response(text)
-            await update.message.reply_text(ai_response)
-        except Exception as e:
-            await update.message.reply_text("Sorry, I encountered an error processing your request.")
+
+        await self.enqueue_reply(update.message, result["response"], kind="final")
 
     async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle document uploads"""
@@ -325,22 +486,23 @@ Feel free to reach out anytime for assistance!
     async def process_file_upload(self, update: Update, context: ContextTypes.DEFAULT_TYPE, file_obj):
         """Process file upload"""
         try:
-            await update.message.reply_text("📁 Processing your file...")
-            
+            asyncio.create_task(
+                context.bot.send_chat_action(update.effective_chat.id, ChatAction.UPLOAD_DOCUMENT)
+            )
+
             file = await context.bot.get_file(file_obj.file_id)
             filename = getattr(file_obj, 'file_name', f"file_{file_obj.file_id}")
             if not filename:
                 filename = f"file_{file_obj.file_id}.unknown"
-            
-            file_path = os.path.join("uploads", filename)
-            os.makedirs("uploads", exist_ok=True)
-            
-            await file.download_to_drive(file_path)
-            
-            result = await self.file_manager.save_user_file(
-                file_path, update.effective_user.id, filename
+
+            # Download into memory and re-send directly, skipping the
+            # local uploads/ round trip through disk
+            file_bytes = bytes(await file.download_as_bytearray())
+
+            result = await self.file_manager.save_user_file_bytes(
+                file_bytes, update.effective_user.id, filename
             )
-            
+
             if result["success"]:
                 response = f"✅ **File Saved Successfully!**\n\n" \
                           f"📁 **Filename:** `{filename}`\n" \
@@ -348,36 +510,46 @@ Feel free to reach out anytime for assistance!
                 await update.message.reply_text(response)
             else:
                 await update.message.reply_text("❌ Failed to save file.")
-            
-            # Cleanup
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
+
         except Exception as e:
             logger.error(f"File upload error: {e}")
             await update.message.reply_text("❌ Error processing file. Please try again.")
 
     async def handle_urls_in_message(self, update: Update, urls: list) -> bool:
         """Handle URLs found in messages - returns True if URLs were blocked"""
-        for url in urls:
-            result = await self.url_scanner.scan_url(url)
-            
-            if not result["is_safe"] and result["risk_level"] in ["high", "medium"]:
-                try:
-                    await update.message.delete()
-                    warning = f"🚨 **Dangerous URL Detected & Blocked!**\n\n" \
-                             f"**URL:** `{url}`\n" \
-                             f"**Risk Level:** {result['risk_level'].upper()}\n" \
-                             f"**Threat Score:** {result.get('score', 'N/A')}/100\n\n" \
-                             f"⚠️ Message automatically removed for your safety.\n" \
-                             f"🛡️ This bot protects you from malicious links!"
-                    
-                    await update.effective_chat.send_message(warning)
+        # Scan all URLs concurrently (bounded to stay inside provider
+        # rate limits) and act on the first unsafe verdict
+        scan_limit = asyncio.Semaphore(8)
+
+        async def scan_one(url):
+            async with scan_limit:
+                return url, await self.url_scanner.scan_url(url)
+
+        tasks = [asyncio.create_task(scan_one(url)) for url in urls]
+
+        try:
+            for completed in asyncio.as_completed(tasks):
+                url, result = await completed
+
+                if not result["is_safe"] and result["risk_level"] in ["high", "medium"]:
+                    try:
+                        await update.message.delete()
+                        warning = f"🚨 **Dangerous URL Detected & Blocked!**\n\n" \
+                                 f"**URL:** `{url}`\n" \
+                                 f"**Risk Level:** {result['risk_level'].upper()}\n" \
+                                 f"**Threat Score:** {result.get('score', 'N/A')}/100\n\n" \
+                                 f"⚠️ Message automatically removed for your safety.\n" \
+                                 f"🛡️ This bot protects you from malicious links!"
+
+                        await update.effective_chat.send_message(warning)
+                    except:
+                        pass
                     return True  # URLs were blocked
-                except:
-                    pass
-                return True  # URLs were blocked
-        
+        finally:
+            # Drop any scans still in flight once a verdict is reached
+            for task in tasks:
+                task.cancel()
+
         return False  # No URLs were blocked
 
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -388,7 +560,7 @@ Feel free to reach out anytime for assistance!
         user_id = query.from_user.id
         
         if query.data == "admin_stats":
-            if await self.user_manager.is_admin(user_id):
+            if self.user_manager.is_admin(user_id):
                 stats_text = f"📊 **Bot Statistics**\n\n" \
                             f"🤖 **Owner:** {config.BOT_OWNER_NAME}\n" \
                             f"👑 **Admins:** {len(self.user_manager.admins)}\n" \
@@ -401,13 +573,13 @@ Feel free to reach out anytime for assistance!
                 await query.edit_message_text("❌ Access denied!")
         
         elif query.data == "admin_settings":
-            if await self.user_manager.is_admin(user_id):
+            if self.user_manager.is_admin(user_id):
                 settings_text = f"⚙️ **Bot Settings**\n\n" \
                                f"🛡️ **Content Moderation:** Active\n" \
                                f"🔗 **URL Scanner:** Active\n" \
                                f"🤖 **AI Assistant:** Active\n" \
                                f"📁 **File Storage:** Active\n" \
-                               f"👑 **Admin Level:** {'Owner' if await self.user_manager.is_owner(user_id) else 'Admin'}"
+                               f"👑 **Admin Level:** {'Owner' if self.user_manager.is_owner(user_id) else 'Admin'}"
                 
                 await query.edit_message_text(settings_text)
             else:
@@ -416,32 +588,15 @@ Feel free to reach out anytime for assistance!
     def run(self):
         """Start the bot with 24/7 reliability"""
         logger.info(f"🚀 Starting 24/7 bot by {config.BOT_OWNER_NAME}")
-        
-        # Configure for maximum uptime
-        retry_attempts = 0
-        max_retries = 5
-        
-        while retry_attempts < max_retries:
-            try:
-                # Run with automatic restart on network errors
-                self.application.run_polling(
-                    drop_pending_updates=True,  # Skip old updates on restart
-                    close_loop=False,          # Keep event loop alive
-                    stop_signals=None          # Don't stop on signals for 24/7 operation
-                )
-                break  # If successful, break the retry loop
-                
-            except Exception as e:
-                retry_attempts += 1
-                logger.error(f"❌ Bot error (attempt {retry_attempts}/{max_retries}): {e}")
-                
-                if retry_attempts < max_retries:
-                    logger.info(f"🔄 Retrying in 10 seconds...")
-                    import time
-                    time.sleep(10)
-                else:
-                    logger.error(f"💥 Max retries reached. Bot stopping.")
-                    raise
+
+        # PTB already reconnects on network errors with its own backoff;
+        # bootstrap_retries=-1 keeps retrying startup forever, and the
+        # default stop signals let SIGTERM shut the bot down cleanly
+        self.application.run_polling(
+            drop_pending_updates=True,  # Skip old updates on restart
+            close_loop=False,           # Keep event loop alive
+            bootstrap_retries=-1        # Retry startup indefinitely
+        )
 
 def main():
     """Main function"""
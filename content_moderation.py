@@ -1,75 +1,152 @@
+import asyncio
+import io
 import re
+import ahocorasick
+from PIL import Image
 from better_profanity import profanity
 from gemini_ai import GeminiAI
 import logging
 
+# Loading the censor wordlist is idempotent but not free, so only do it
+# for the first moderator constructed in the process
+_censor_words_loaded = False
+
 class ContentModerator:
-    def __init__(self):
-        """Initialize content moderator"""
-        self.gemini_ai = GeminiAI()
+    def __init__(self, gemini_ai: GeminiAI = None):
+        """Initialize content moderator, reusing a shared Gemini client if given"""
+        self.gemini_ai = gemini_ai or GeminiAI()
         self.logger = logging.getLogger(__name__)
-        
+
         # Initialize profanity filter
-        profanity.load_censor_words()
-        
+        global _censor_words_loaded
+        if not _censor_words_loaded:
+            profanity.load_censor_words()
+            _censor_words_loaded = True
+
         # Common adult content keywords
         self.adult_keywords = [
             'xxx', 'porn', 'sex', 'nude', 'naked', 'adult', 'nsfw',
             'erotic', 'sexual', 'explicit', 'mature'
         ]
-        
+
         # Copyright-related keywords
         self.copyright_keywords = [
             'pirated', 'cracked', 'leaked', 'bootleg', 'unauthorized',
             'copyright', '©', 'all rights reserved', 'proprietary'
         ]
 
+        # Compile all keyword lists into one Aho-Corasick automaton so a
+        # single pass over the text finds every violation category
+        self.keyword_automaton = ahocorasick.Automaton()
+        for keyword in self.adult_keywords:
+            self.keyword_automaton.add_word(keyword, ("adult_content", keyword))
+        for keyword in self.copyright_keywords:
+            self.keyword_automaton.add_word(keyword, ("copyright", keyword))
+        for word in profanity.CENSOR_WORDSET:
+            self.keyword_automaton.add_word(str(word).lower(), ("profanity", str(word)))
+        self.keyword_automaton.make_automaton()
+
+        # Spam heuristics compiled once into a single alternation so
+        # is_spam_content walks the text in one pass
+        self._spam_re = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in [
+                r'(https?://\S+){3,}',  # Multiple URLs
+                r'[A-Z]{5,}',  # Excessive caps
+                # Named group: a numbered \1 would resolve against the
+                # URL group once the patterns are joined into one
+                # alternation
+                r'(?P<ch>.)(?P=ch){4,}',  # Repeated characters
+                r'(buy now|click here|limited time|act now)',  # Spam phrases
+            ]),
+            re.IGNORECASE
+        )
+
+    def _keyword_violations(self, text: str) -> list:
+        """Single automaton pass over the lowercased text
+
+        One C-level scan replaces the separate profanity/adult/
+        copyright substring loops; an empty result is the fast path
+        that lets most messages skip straight to (or past) the AI.
+        """
+        text_lower = text.lower()
+        found_categories = set()
+        for end, (category, keyword) in self.keyword_automaton.iter(text_lower):
+            if category == "profanity":
+                # better_profanity matched whole words, so profanity
+                # hits only count with non-alphanumeric neighbours -
+                # otherwise "class", "assessment" or "cocktail" trip
+                # the substring entries inside them
+                start = end - len(keyword) + 1
+                if start > 0 and text_lower[start - 1].isalnum():
+                    continue
+                if end + 1 < len(text_lower) and text_lower[end + 1].isalnum():
+                    continue
+            found_categories.add(category)
+
+        return [category for category in ("profanity", "adult_content", "copyright")
+                if category in found_categories]
+
     async def check_text_content(self, text: str) -> dict:
         """Check text for inappropriate content"""
-        violations = []
-        
-        # Check for profanity
-        if profanity.contains_profanity(text):
-            violations.append("profanity")
-        
-        # Check for adult content
-        text_lower = text.lower()
-        if any(keyword in text_lower for keyword in self.adult_keywords):
-            violations.append("adult_content")
-        
-        # Check for potential copyright violations
-        if any(keyword in text_lower for keyword in self.copyright_keywords):
-            violations.append("copyright")
-        
+        violations = self._keyword_violations(text)
+
+        # Local checks already doom the message - skip the Gemini call
+        if violations:
+            return {
+                "is_safe": False,
+                "violations": violations,
+                "cleaned_text": profanity.censor(text)
+            }
+
         # Use Gemini AI for advanced moderation
         ai_result = await self.gemini_ai.moderate_content(text)
         if not ai_result["is_safe"]:
             violations.append("ai_flagged")
-        
+
         return {
             "is_safe": len(violations) == 0,
             "violations": violations,
             "cleaned_text": profanity.censor(text) if violations else text
         }
 
-    async def check_image_content(self, image_path: str) -> dict:
-        """Basic image content checking"""
+    async def check_and_respond(self, text: str) -> dict:
+        """Moderate a message and get the AI reply in one Gemini round trip"""
+        violations = self._keyword_violations(text)
+
+        # Local checks flagged the message - no need to spend a Gemini
+        # call on it
+        if violations:
+            return {"is_safe": False, "violations": violations, "response": ""}
+
+        ai_result = await self.gemini_ai.moderate_and_respond(text)
+        if not ai_result["is_safe"]:
+            violations = ai_result["violations"] or ["ai_flagged"]
+
+        return {
+            "is_safe": len(violations) == 0,
+            "violations": violations,
+            "response": ai_result["response"]
+        }
+
+    async def check_image_content(self, image) -> dict:
+        """Basic image content checking for a file path or raw bytes"""
         try:
-            # Load image
-            img = cv2.imread(image_path)
-            if img is None:
-                return {"is_safe": True, "reason": "Could not process image"}
-            
-            # Basic checks (simplified)
-            # In a real implementation, you'd use more sophisticated AI models
-            height, width = img.shape[:2]
-            
+            # Pillow only parses the header for the size, and the read
+            # runs in a worker thread so the event loop stays free
+            def read_dimensions():
+                source = io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image
+                with Image.open(source) as img:
+                    return img.size
+
+            loop = asyncio.get_running_loop()
+            width, height = await loop.run_in_executor(None, read_dimensions)
+
             # Check for suspicious aspect ratios or sizes
             if height < 100 or width < 100:
                 return {"is_safe": False, "reason": "Suspicious image dimensions"}
-            
+
             return {"is_safe": True, "reason": "Image passed basic checks"}
-            
+
         except Exception as e:
             self.logger.error(f"Image moderation error: {e}")
             return {"is_safe": True, "reason": "Could not analyze image"}
@@ -80,12 +157,4 @@ class ContentModerator:
 
     def is_spam_content(self, text: str) -> bool:
         """Check if content appears to be spam"""
-        spam_indicators = [
-            r'(https?://\S+){3,}',  # Multiple URLs
-            r'[A-Z]{5,}',  # Excessive caps
-            r'(.)\1{4,}',  # Repeated characters
-            r'(buy now|click here|limited time|act now)',  # Spam phrases
-        ]
-        
-        text_lower = text.lower()
-        return any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in spam_indicators)
\ No newline at end of file
+        return self._spam_re.search(text) is not None
\ No newline at end of file
@@ -1,55 +1,215 @@
 import aiofiles
+import asyncio
+import httpx
 import os
 import magic
+from io import BytesIO
 from telegram import Bot
 from config import config
 import logging
 from typing import Optional
 import hashlib
 
+# The file hash only identifies duplicates - it needs speed, not
+# cryptographic strength. Prefer BLAKE3 (SIMD, multi-GiB/s) and fall
+# back to stdlib BLAKE2b when the wheel is unavailable.
+try:
+    import blake3
+
+    def _new_file_hasher():
+        return blake3.blake3()
+except ImportError:
+    def _new_file_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Telegram rejects bot uploads above 50MB; checking first avoids
+# hashing and reading a file that can never be sent
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Message templates shared by both upload paths - filled with a single
+# format_map call instead of being reassembled per send
+_UPLOAD_CAPTION_TMPL = "📁 **File Storage**\n" \
+                       "**Name:** `{filename}`\n" \
+                       "**Size:** {size}\n" \
+                       "**Type:** `{mime}`\n" \
+                       "**Hash:** `{hash}`"
+
+_FILE_INFO_TMPL = "📄 **File Info**\n" \
+                  "**User ID:** `{user_id}`\n" \
+                  "**Filename:** `{filename}`\n" \
+                  "**Message ID:** `{message_id}`\n" \
+                  "**Size:** {size}\n" \
+                  "**Type:** `{mime_type}`"
+
 class FileManager:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, http: httpx.AsyncClient = None):
         """Initialize file manager"""
         self.bot = bot
-        self.storage_channel_id = config.STORAGE_CHANNEL_ID
+        # Coerce both channel ids to int once - every upload sends to
+        # them, and PTB otherwise re-coerces string ids per call
+        self.storage_channel_id = int(config.STORAGE_CHANNEL_ID)
+        self._user_data_channel_id = int(config.USER_DATA_SAVE_CHANNEL_ID)
         self.logger = logging.getLogger(__name__)
+        self.http = http or httpx.AsyncClient(timeout=60)
+
+        # One libmagic cookie for the manager's lifetime - from_file/
+        # from_buffer re-load the ~1MB rules database on every call
+        self._mime = magic.Magic(mime=True)
         
         # Create uploads directory if it doesn't exist
         self.uploads_dir = "uploads"
         os.makedirs(self.uploads_dir, exist_ok=True)
 
-    async def upload_file_to_storage(self, file_path: str, original_filename: str) -> Optional[str]:
-        """Upload file to storage channel and return message ID"""
+    async def upload_file_to_storage(self, file_path: str, original_filename: str,
+                                     *, size: int = None) -> Optional[dict]:
+        """Upload file to storage channel and return its metadata
+
+        Returns a dict with message_id, size, mime_type and hash so
+        callers reuse the values computed here instead of re-statting
+        and re-sniffing the file. Callers that already stat'd the file
+        pass size to skip the syscall here.
+        """
         try:
-            # Get file info
-            file_size = os.path.getsize(file_path)
-            file_mime = magic.from_file(file_path, mime=True)
+            # Get file info; bail before hashing anything Telegram
+            # would refuse anyway
+            file_size = size if size is not None else os.path.getsize(file_path)
+            if file_size > MAX_UPLOAD_BYTES:
+                self.logger.warning(
+                    f"Rejecting {original_filename}: {self._format_file_size(file_size)} "
+                    f"exceeds the {self._format_file_size(MAX_UPLOAD_BYTES)} upload limit"
+                )
+                return None
+
+            file_mime = self._mime.from_file(file_path)
             
-            # Generate file hash for uniqueness
-            with open(file_path, 'rb') as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
+            # Open once: hash in 1MB chunks off the event loop, then
+            # rewind and hand the same handle to send_document. The
+            # upload read is then served from page cache instead of a
+            # second cold disk pass.
+            def open_and_hash():
+                f = open(file_path, 'rb', buffering=1 << 20)
+                try:
+                    h = _new_file_hasher()
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        h.update(chunk)
+                    f.seek(0)
+                    return f, h.hexdigest()
+                except Exception:
+                    f.close()
+                    raise
+
+            file_handle, file_hash = await asyncio.to_thread(open_and_hash)
             
-            caption = f"📁 **File Storage**\n" \
-                     f"**Name:** `{original_filename}`\n" \
-                     f"**Size:** {self._format_file_size(file_size)}\n" \
-                     f"**Type:** `{file_mime}`\n" \
-                     f"**Hash:** `{file_hash}`"
-
-            # Send file to storage channel
-            with open(file_path, 'rb') as file:
+            caption = _UPLOAD_CAPTION_TMPL.format_map({
+                "filename": original_filename,
+                "size": self._format_file_size(file_size),
+                "mime": file_mime,
+                "hash": file_hash,
+            })
+
+            # Send file to storage channel from the already-open handle
+            try:
                 message = await self.bot.send_document(
                     chat_id=self.storage_channel_id,
-                    document=file,
+                    document=file_handle,
                     caption=caption,
                     filename=original_filename
                 )
-            
-            return str(message.message_id)
-            
+            finally:
+                file_handle.close()
+
+            return {
+                "message_id": str(message.message_id),
+                "size": file_size,
+                "mime_type": file_mime,
+                "hash": file_hash,
+            }
+
+        except Exception as e:
+            self.logger.error(f"File upload error: {e}")
+            return None
+
+    async def upload_bytes_to_storage(self, data: bytes, original_filename: str) -> Optional[dict]:
+        """Upload an in-memory file to the storage channel and return its metadata"""
+        try:
+            file_size = len(data)
+            if file_size > MAX_UPLOAD_BYTES:
+                self.logger.warning(
+                    f"Rejecting {original_filename}: {self._format_file_size(file_size)} "
+                    f"exceeds the {self._format_file_size(MAX_UPLOAD_BYTES)} upload limit"
+                )
+                return None
+
+            file_mime = self._mime.from_buffer(data[:4096])
+            h = _new_file_hasher()
+            h.update(data)
+            file_hash = h.hexdigest()
+
+            caption = _UPLOAD_CAPTION_TMPL.format_map({
+                "filename": original_filename,
+                "size": self._format_file_size(file_size),
+                "mime": file_mime,
+                "hash": file_hash,
+            })
+
+            message = await self.bot.send_document(
+                chat_id=self.storage_channel_id,
+                document=BytesIO(data),
+                caption=caption,
+                filename=original_filename
+            )
+
+            return {
+                "message_id": str(message.message_id),
+                "size": file_size,
+                "mime_type": file_mime,
+                "hash": file_hash,
+            }
+
         except Exception as e:
             self.logger.error(f"File upload error: {e}")
             return None
 
+    async def save_user_file_bytes(self, data: bytes, user_id: int, filename: str) -> dict:
+        """Save an in-memory file without touching the local disk"""
+        try:
+            upload = await self.upload_bytes_to_storage(data, filename)
+
+            if upload:
+                file_info = {
+                    "user_id": user_id,
+                    "filename": filename,
+                    "message_id": upload["message_id"],
+                    "size": upload["size"],
+                    "mime_type": upload["mime_type"]
+                }
+
+                # Post the file info off the critical path - the user's
+                # confirmation doesn't need to wait for the audit copy
+                asyncio.create_task(self._save_file_info_to_channel(file_info))
+
+                return {
+                    "success": True,
+                    "message_id": upload["message_id"],
+                    "file_info": file_info
+                }
+
+            return {"success": False, "error": "Failed to upload file"}
+
+        except Exception as e:
+            self.logger.error(f"Save user file error: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def download_file_streamed(self, file, file_path: str, chunk_size: int = 1 << 20):
+        """Stream a Telegram file to disk in fixed-size chunks"""
+        async with self.http.stream("GET", file.file_path) as response:
+            response.raise_for_status()
+            async with aiofiles.open(file_path, "wb") as f:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    await f.write(chunk)
+
     async def download_file_from_storage(self, message_id: str, download_path: str) -> bool:
         """Download file from storage channel"""
         try:
@@ -60,9 +220,10 @@ class FileManager:
             )
             
             if message.document:
-                # Download file
+                # Stream to disk in bounded chunks - download_to_drive
+                # buffers the whole file in memory first
                 file = await self.bot.get_file(message.document.file_id)
-                await file.download_to_drive(download_path)
+                await self.download_file_streamed(file, download_path)
                 return True
             
             return False
@@ -74,24 +235,27 @@ class FileManager:
     async def save_user_file(self, file_path: str, user_id: int, filename: str) -> dict:
         """Save file and return file info"""
         try:
-            # Upload to storage channel
-            message_id = await self.upload_file_to_storage(file_path, filename)
-            
-            if message_id:
+            # One stat up front; its size rides through the upload so
+            # no later step touches the inode again
+            st = os.stat(file_path)
+            upload = await self.upload_file_to_storage(file_path, filename, size=st.st_size)
+
+            if upload:
                 file_info = {
                     "user_id": user_id,
                     "filename": filename,
-                    "message_id": message_id,
-                    "size": os.path.getsize(file_path),
-                    "mime_type": magic.from_file(file_path, mime=True)
+                    "message_id": upload["message_id"],
+                    "size": upload["size"],
+                    "mime_type": upload["mime_type"]
                 }
-                
-                # Save file info to user data channel
-                await self._save_file_info_to_channel(file_info)
-                
+
+                # Post the file info off the critical path - the user's
+                # confirmation doesn't need to wait for the audit copy
+                asyncio.create_task(self._save_file_info_to_channel(file_info))
+
                 return {
                     "success": True,
-                    "message_id": message_id,
+                    "message_id": upload["message_id"],
                     "file_info": file_info
                 }
             
@@ -104,15 +268,13 @@ class FileManager:
     async def _save_file_info_to_channel(self, file_info: dict):
         """Save file information to user data channel"""
         try:
-            info_text = f"📄 **File Info**\n" \
-                       f"**User ID:** `{file_info['user_id']}`\n" \
-                       f"**Filename:** `{file_info['filename']}`\n" \
-                       f"**Message ID:** `{file_info['message_id']}`\n" \
-                       f"**Size:** {self._format_file_size(file_info['size'])}\n" \
-                       f"**Type:** `{file_info['mime_type']}`"
+            info_text = _FILE_INFO_TMPL.format_map({
+                **file_info,
+                "size": self._format_file_size(file_info['size']),
+            })
             
             await self.bot.send_message(
-                chat_id=config.USER_DATA_SAVE_CHANNEL_ID,
+                chat_id=self._user_data_channel_id,
                 text=info_text
             )
             
@@ -121,26 +283,31 @@ class FileManager:
 
     def _format_file_size(self, size_bytes: int) -> str:
         """Format file size in human readable format"""
-        if size_bytes == 0:
-            return "0 B"
-        
-        size_names = ["B", "KB", "MB", "GB", "TB"]
-        i = 0
-        while size_bytes >= 1024.0 and i < len(size_names) - 1:
-            size_bytes /= 1024.0
-            i += 1
-        
-        return f"{size_bytes:.1f} {size_names[i]}"
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
 
-    def is_supported_file_type(self, filename: str) -> bool:
-        """Check if file type is supported"""
-        # Support all file types as requested
+        # bit_length picks the unit in one integer op - no division loop
+        i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+        return f"{size_bytes / (1 << (10 * i)):.1f} {_SIZE_UNITS[i]}"
+
+    @staticmethod
+    def is_supported_file_type(filename: str) -> bool:
+        """Check if file type is supported
+
+        All file types are accepted; kept as a static method so a
+        future policy can gate uploads without touching call sites,
+        while costing no self-binding today.
+        """
         return True
 
     async def cleanup_temp_file(self, file_path: str):
         """Clean up temporary file"""
+        # Unlink directly and treat "already gone" as success - no
+        # exists() pre-check (TOCTOU race, extra stat), and the syscall
+        # runs off the loop in case the file lives on slow storage
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
+            await asyncio.to_thread(os.unlink, file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
             self.logger.error(f"Cleanup error: {e}")
\ No newline at end of file
@@ -1,56 +1,235 @@
+import asyncio
+import hashlib
 import google.generativeai as genai
+import orjson
+from cachetools import TTLCache
 from config import config
 import logging
 
+# Prompt templates are built once at import; per-call work is a single
+# format_map substitution instead of re-assembling the f-string
+_FUSED_PROMPT = """
+You are a Telegram assistant with a safety filter. First check the
+user message for adult/explicit content, hate speech, harassment,
+copyright violations, spam or dangerous content. Then, only if it is
+safe, write a helpful reply.
+{context}
+
+User message: "{text}"
+
+Respond ONLY in JSON format:
+{{
+    "is_safe": true/false,
+    "violations": ["list of violations found"],
+    "response": "your reply if safe, otherwise empty"
+}}
+"""
+
+# Compact schema instruction - latency and billing scale with prompt
+# tokens, and the JSON response mime type on the model makes the
+# verbose format description redundant
+_MODERATION_PROMPT = (
+    'Classify (adult|hate|copyright|spam|harm|safe). '
+    'Output JSON {{"is_safe": bool, "violations": [str], '
+    '"confidence": float, "reason": str}}. '
+    'Content: "{text}"'
+)
+
+# Contexts shorter than this are cheaper to resend than to register as
+# a server-side cached-content resource
+_CONTEXT_CACHE_MIN_CHARS = 4096
+
+# Fallbacks returned when a Gemini call fails; recognized by
+# _cached_call so an outage is never pinned in the cache for its TTL
+_ERROR_REPLY = "I'm sorry, I encountered an error while processing your request. Please try again."
+_MODERATION_UNAVAILABLE = "Moderation unavailable"
+
+def _is_error_result(result) -> bool:
+    """True when a producer returned its failure fallback"""
+    if isinstance(result, str):
+        return result == _ERROR_REPLY
+    if isinstance(result, dict):
+        return (result.get("response") == _ERROR_REPLY
+                or result.get("reason") == _MODERATION_UNAVAILABLE)
+    return False
+
 class GeminiAI:
     def __init__(self):
         """Initialize Gemini AI with API key"""
         if config.GEMINI_API_KEY:
-            genai.configure(api_key=config.GEMINI_API_KEY)
+            # Async gRPC transport multiplexes concurrent requests over
+            # one HTTP/2 connection
+            genai.configure(api_key=config.GEMINI_API_KEY, transport='grpc_asyncio')
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Moderation calls force a JSON response so the verdict parses
+        # directly instead of being sniffed out of prose
+        self._json_model = genai.GenerativeModel(
+            'gemini-1.5-flash',
+            generation_config={"response_mime_type": "application/json", "temperature": 0}
+        )
         self.logger = logging.getLogger(__name__)
 
+        # Duplicate prompts ("hi", "help", ...) are answered from cache
+        # instead of paying a Gemini round trip each time
+        self._response_cache = TTLCache(maxsize=4096, ttl=300)
+        self._moderation_cache = TTLCache(maxsize=4096, ttl=600)
+        self._call_locks = {}
+
+        # Long repeated contexts are registered with Gemini's context
+        # caching so the prefix isn't re-tokenized (and re-billed) on
+        # every call; maps context digest -> model bound to the cache
+        self._context_models = TTLCache(maxsize=64, ttl=3300)
+
+    def _cache_key(self, mode: str, text: str, context: str = None) -> str:
+        """Build a versioned cache key from the normalized prompt"""
+        payload = f"{context or ''}:{text.strip().lower()}"
+        digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+        return f"v1:gemini:{mode}:{digest}"
+
+    async def _cached_call(self, cache: TTLCache, key: str, producer):
+        """Serve from cache, guarding misses with a per-key lock"""
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        lock = self._call_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = await producer()
+            # Error fallbacks pass through uncached so the next
+            # identical prompt retries instead of replaying the outage
+            if not _is_error_result(result):
+                cache[key] = result
+            self._call_locks.pop(key, None)
+            return result
+
     async def generate_response(self, prompt: str, context: str = None) -> str:
         """Generate AI response using Gemini"""
+        key = self._cache_key("response", prompt, context)
+        return await self._cached_call(
+            self._response_cache, key,
+            lambda: self._generate_response_uncached(prompt, context)
+        )
+
+    @staticmethod
+    async def _generate(model, prompt: str):
+        """Run a generation without blocking the event loop
+
+        Prefers the SDK's native async API; older SDK versions without
+        it get the sync call pushed onto a worker thread instead.
+        """
+        if hasattr(model, 'generate_content_async'):
+            return await model.generate_content_async(prompt)
+        return await asyncio.to_thread(model.generate_content, prompt)
+
+    async def _model_for_context(self, context: str):
+        """Get a model bound to a server-side cached copy of a long context
+
+        Returns None when context caching is unavailable, in which case
+        the caller falls back to inlining the context into the prompt.
+        """
+        digest = hashlib.blake2b(context.encode(), digest_size=16).hexdigest()
+        model = self._context_models.get(digest)
+        if model is None:
+            try:
+                # CachedContent.create is a synchronous network call -
+                # run it on a worker thread so registering a context
+                # doesn't stall every other handler on the loop
+                cached = await asyncio.to_thread(
+                    genai.caching.CachedContent.create,
+                    model='gemini-1.5-flash',
+                    contents=[{'role': 'user', 'parts': [{'text': context}]}],
+                    ttl='3600s'
+                )
+                model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            except Exception as e:
+                self.logger.warning(f"Gemini context caching unavailable: {e}")
+                return None
+            self._context_models[digest] = model
+        return model
+
+    async def _generate_response_uncached(self, prompt: str, context: str = None) -> str:
+        """Generate AI response without consulting the cache"""
         try:
+            # Large contexts go through the server-side cache so only
+            # the prompt itself is tokenized per request
+            if context and len(context) >= _CONTEXT_CACHE_MIN_CHARS:
+                model = await self._model_for_context(context)
+                if model is not None:
+                    response = await self._generate(
+                        model, f"User: {prompt}\n\nPlease provide a helpful response:"
+                    )
+                    return response.text
+
             if context:
                 full_prompt = f"Context: {context}\n\nUser: {prompt}\n\nPlease provide a helpful response:"
             else:
                 full_prompt = prompt
 
-            response = self.model.generate_content(full_prompt)
+            response = await self._generate(self.model, full_prompt)
             return response.text
         except Exception as e:
             self.logger.error(f"Gemini AI error: {e}")
-            return "I'm sorry, I encountered an error while processing your request. Please try again."
+            return _ERROR_REPLY
+
+    async def moderate_and_respond(self, prompt: str, context: str = None) -> dict:
+        """Moderate and answer a message in a single Gemini call"""
+        key = self._cache_key("fused", prompt, context)
+        return await self._cached_call(
+            self._response_cache, key,
+            lambda: self._moderate_and_respond_uncached(prompt, context)
+        )
+
+    async def _moderate_and_respond_uncached(self, prompt: str, context: str = None) -> dict:
+        """Fused moderation and reply without consulting the cache"""
+        try:
+            fused_prompt = _FUSED_PROMPT.format_map({
+                "context": f"Context: {context}" if context else "",
+                "text": prompt,
+            })
+
+            response = await self._generate(self._json_model, fused_prompt)
+            raw = response.text
+
+            # Pull the JSON object out of the reply (models often wrap it
+            # in markdown fences)
+            start, end = raw.find('{'), raw.rfind('}')
+            result = orjson.loads(raw[start:end + 1])
+            return {
+                "is_safe": bool(result.get("is_safe", True)),
+                "violations": result.get("violations", []),
+                "response": result.get("response", "")
+            }
+        except Exception as e:
+            self.logger.error(f"Gemini fused call error: {e}")
+            return {
+                "is_safe": True,
+                "violations": [],
+                "response": _ERROR_REPLY
+            }
 
     async def moderate_content(self, text: str) -> dict:
         """Use Gemini to analyze content for moderation"""
+        key = self._cache_key("moderation", text)
+        return await self._cached_call(
+            self._moderation_cache, key,
+            lambda: self._moderate_content_uncached(text)
+        )
+
+    async def _moderate_content_uncached(self, text: str) -> dict:
+        """Moderation verdict without consulting the cache"""
         try:
-            moderation_prompt = f"""
-            Analyze this content for:
-            1. Adult/explicit content
-            2. Hate speech or harassment
-            3. Copyright violations (obvious copied content)
-            4. Spam or promotional content
-            5. Harmful or dangerous content
-
-            Content: "{text}"
-
-            Respond in JSON format:
-            {{
-                "is_safe": true/false,
-                "violations": ["list of violations found"],
-                "confidence": 0.0-1.0,
-                "reason": "explanation"
-            }}
-            """
-            
-            response = self.model.generate_content(moderation_prompt)
-            # Parse JSON response (simplified for now)
-            if "false" in response.text.lower():
-                return {"is_safe": False, "reason": "Content flagged by AI"}
-            return {"is_safe": True, "reason": "Content approved by AI"}
+            moderation_prompt = _MODERATION_PROMPT.format_map({"text": text})
+
+            response = await self._generate(self._json_model, moderation_prompt)
+            result = orjson.loads(response.text)
+            return {
+                "is_safe": bool(result.get("is_safe", True)),
+                "reason": result.get("reason", "Content approved by AI")
+            }
         except Exception as e:
             self.logger.error(f"Content moderation error: {e}")
-            return {"is_safe": True, "reason": "Moderation unavailable"}
\ No newline at end of file
+            return {"is_safe": True, "reason": _MODERATION_UNAVAILABLE}
\ No newline at end of file
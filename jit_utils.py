@@ -0,0 +1,26 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+_missing_warned = False
+
+def maybe_njit(**njit_kwargs):
+    """Decorate a function with numba.njit, falling back to plain Python
+
+    Numba is an optional accelerator: when it is installed the wrapped
+    function compiles to native code on first call, otherwise the
+    original function is returned untouched and a warning is logged
+    once.
+    """
+    def decorator(fn):
+        global _missing_warned
+        try:
+            from numba import njit
+            return njit(**njit_kwargs)(fn)
+        except ImportError:
+            if not _missing_warned:
+                logger.warning("numba not installed - numeric helpers run in pure Python")
+                _missing_warned = True
+            return fn
+
+    return decorator
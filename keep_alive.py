@@ -18,32 +18,32 @@ class BotKeepAlive:
         self.restart_count = 0
         self.last_restart = None
         self.max_restarts_per_hour = 10
-        
-    def start_bot(self):
+
+    async def start_bot(self):
         """Start the bot process"""
         try:
             logger.info("🚀 Starting bot process...")
-            self.bot_process = subprocess.Popen([
-                sys.executable, 'bot.py'
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            # Append output to a log file instead of PIPEs nobody
+            # drains - a full 64KB pipe buffer blocks the child and
+            # looks exactly like a hang to the monitor
+            log_file = open('bot.log', 'ab')
+            self.bot_process = await asyncio.create_subprocess_exec(
+                sys.executable, 'bot.py',
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+            log_file.close()
             logger.info(f"✅ Bot started with PID: {self.bot_process.pid}")
             return True
         except Exception as e:
             logger.error(f"❌ Failed to start bot: {e}")
             return False
-    
-    def is_bot_running(self):
-        """Check if bot process is running"""
-        if self.bot_process is None:
-            return False
-        
-        # Check if process is still alive
-        return self.bot_process.poll() is None
-    
-    def restart_bot(self):
+
+    async def restart_bot(self):
         """Restart the bot with rate limiting"""
         current_time = time.time()
-        
+
         # Rate limiting: max restarts per hour
         if self.last_restart and (current_time - self.last_restart) < 3600:
             if self.restart_count >= self.max_restarts_per_hour:
@@ -52,93 +52,139 @@ class BotKeepAlive:
         else:
             # Reset counter after an hour
             self.restart_count = 0
-        
+
         logger.info("🔄 Restarting bot...")
-        
+
         # Stop current process
-        if self.bot_process and self.is_bot_running():
-            try:
-                self.bot_process.terminate()
-                self.bot_process.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.bot_process.kill()
-                self.bot_process.wait()
-        
+        await self._stop_process()
+
         # Start new process
-        if self.start_bot():
+        if await self.start_bot():
             self.restart_count += 1
             self.last_restart = current_time
             logger.info(f"✅ Bot restarted successfully (restart #{self.restart_count})")
             return True
-        
+
         return False
-    
+
+    async def _stop_process(self):
+        """Terminate the child, escalating to SIGKILL after 10s"""
+        if self.bot_process is None or self.bot_process.returncode is not None:
+            return
+
+        self.bot_process.terminate()
+        try:
+            await asyncio.wait_for(self.bot_process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            self.bot_process.kill()
+            await self.bot_process.wait()
+
     async def monitor_bot(self):
-        """Monitor bot health and restart if needed"""
+        """Restart the bot the moment its process exits
+
+        wait() parks on SIGCHLD, so the monitor makes zero wakeups
+        while the bot is healthy and reacts instantly when it dies -
+        no 30-second polling loop.
+        """
         logger.info("🔍 Starting 24/7 bot monitoring...")
-        
+        uptime_task = asyncio.create_task(self._uptime_logger())
+
+        try:
+            while True:
+                returncode = await self.bot_process.wait()
+                logger.warning(f"⚠️ Bot exited with code {returncode}, attempting restart...")
+
+                while not await self.restart_bot():
+                    logger.error("❌ Failed to restart bot, waiting 60 seconds...")
+                    await asyncio.sleep(60)
+        finally:
+            uptime_task.cancel()
+
+    async def _uptime_logger(self):
+        """Log a health line every 30 minutes"""
         while True:
-            try:
-                if not self.is_bot_running():
-                    logger.warning("⚠️ Bot process not running, attempting restart...")
-                    
-                    if not self.restart_bot():
-                        logger.error("❌ Failed to restart bot, waiting 60 seconds...")
-                        await asyncio.sleep(60)
-                        continue
-                
-                # Log status every 30 minutes
-                if int(time.time()) % 1800 == 0:  # Every 30 minutes
-                    uptime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    logger.info(f"💚 Bot healthy - Uptime check: {uptime}")
-                
-                # Check every 30 seconds
-                await asyncio.sleep(30)
-                
-            except Exception as e:
-                logger.error(f"❌ Monitor error: {e}")
-                await asyncio.sleep(60)
-    
-    def cleanup(self):
+            await asyncio.sleep(1800)
+            uptime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            logger.info(f"💚 Bot healthy - Uptime check: {uptime}")
+
+    async def cleanup(self):
         """Cleanup processes on exit"""
-        if self.bot_process and self.is_bot_running():
+        if self.bot_process and self.bot_process.returncode is None:
             logger.info("🛑 Stopping bot process...")
-            self.bot_process.terminate()
+            await self._stop_process()
+
+    def run_in_process(self):
+        """Supervise the bot inside this interpreter
+
+        Restarts re-instantiate TelegramBot and re-enter run() - no
+        fork, no interpreter startup, no re-import of the heavy
+        telegram/google-generativeai modules. A clean return (signal
+        shutdown) ends supervision instead of restarting.
+        """
+        from bot import TelegramBot
+
+        backoff = 5
+        while True:
+            current_time = time.time()
+            if self.last_restart and (current_time - self.last_restart) < 3600:
+                if self.restart_count >= self.max_restarts_per_hour:
+                    logger.warning(f"⚠️ Too many restarts ({self.restart_count}) in the last hour. Waiting...")
+                    time.sleep(300)
+                    continue
+            else:
+                self.restart_count = 0
+
             try:
-                self.bot_process.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                self.bot_process.kill()
-                self.bot_process.wait()
-    
+                logger.info("🚀 Starting bot in-process...")
+                TelegramBot().run()
+                logger.info("👋 Bot exited cleanly")
+                return
+            except Exception as e:
+                logger.error(f"❌ Bot crashed: {e}")
+                self.restart_count += 1
+                self.last_restart = time.time()
+                logger.info(f"🔄 Restarting in {backoff}s (restart #{self.restart_count})")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+
     async def run(self):
         """Main keep-alive loop"""
         try:
             # Initial bot start
-            if not self.start_bot():
+            if not await self.start_bot():
                 logger.error("❌ Failed to start bot initially")
                 return
-            
+
             # Start monitoring
             await self.monitor_bot()
-            
+
         except KeyboardInterrupt:
             logger.info("🛑 Shutdown requested...")
         except Exception as e:
             logger.error(f"❌ Keep-alive error: {e}")
         finally:
-            self.cleanup()
+            await self.cleanup()
 
 def main():
-    """Entry point"""
+    """Entry point
+
+    In-process supervision is the default; pass --watchdog to keep the
+    bot in a child process instead, which also survives interpreter-
+    level failures (segfaults, OOM kills) at the cost of a fork and
+    full module re-import per restart.
+    """
     logger.info("🤖 24/7 Bot Keep-Alive System Starting...")
     keep_alive = BotKeepAlive()
-    
+
     try:
-        asyncio.run(keep_alive.run())
+        if '--watchdog' in sys.argv:
+            asyncio.run(keep_alive.run())
+        else:
+            keep_alive.run_in_process()
     except KeyboardInterrupt:
         logger.info("👋 Keep-alive system stopped")
     except Exception as e:
         logger.error(f"❌ System error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,5 +1,6 @@
 import asyncio
 from telegram import Bot, BotCommand
+from telegram.request import HTTPXRequest
 from config import config
 import logging
 
@@ -7,64 +8,68 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Static setup payloads built once at import instead of per run
+_COMMANDS = [
+    BotCommand("start", "🚀 Start the bot and see welcome message"),
+    BotCommand("help", "🆘 Show all available commands and features"),
+    BotCommand("admin", "👑 Access admin control panel"),
+    BotCommand("ban", "🚫 Ban a user (Admin only)"),
+    BotCommand("unban", "✅ Unban a user (Admin only)"),
+    BotCommand("addadmin", "👑 Add new admin (Owner only)"),
+    BotCommand("deladmin", "❌ Remove admin (Owner only)"),
+    BotCommand("scan", "🔍 Manually scan URL for security threats"),
+    BotCommand("contact", "📞 Get developer contact and support information"),
+]
+
+_DESCRIPTION = (
+    f"🤖 Advanced Telegram Bot by {config.BOT_OWNER_NAME}\n\n"
+    "🔥 Features:\n"
+    "• AI Assistant powered by Gemini\n"
+    "• File Management & Storage\n"
+    "• Content Moderation & Security\n"
+    "• Automatic URL Scanning\n"
+    "• Admin Management Tools\n"
+    "• Bad Word Filtering\n\n"
+    "Ready to assist you! 🚀"
+)
+
+_SHORT_DESCRIPTION = (
+    f"🤖 Advanced Bot by {config.BOT_OWNER_NAME} - AI Assistant, File Management, Security & More!"
+)
+
 async def setup_bot_commands():
     """Setup bot commands automatically via Telegram API"""
-    bot = Bot(token=config.BOT_TOKEN)
-    
-    # Define all bot commands
-    commands = [
-        BotCommand("start", "🚀 Start the bot and see welcome message"),
-        BotCommand("help", "🆘 Show all available commands and features"),
-        BotCommand("admin", "👑 Access admin control panel"),
-        BotCommand("ban", "🚫 Ban a user (Admin only)"),
-        BotCommand("unban", "✅ Unban a user (Admin only)"),
-        BotCommand("addadmin", "👑 Add new admin (Owner only)"),
-        BotCommand("deladmin", "❌ Remove admin (Owner only)"),
-        BotCommand("scan", "🔍 Manually scan URL for security threats"),
-        BotCommand("contact", "📞 Get developer contact and support information"),
-    ]
-    
     try:
-        # Set commands for the bot
-        await bot.set_my_commands(commands)
+        # The four API calls have no data dependency, so they run
+        # concurrently instead of paying four serial round trips; the
+        # pool is sized to match, since PTB's default single connection
+        # would queue three of them into a 1s pool timeout
+        request = HTTPXRequest(connection_pool_size=4)
+        async with Bot(token=config.BOT_TOKEN, request=request) as bot:
+            _, _, _, bot_info = await asyncio.gather(
+                bot.set_my_commands(_COMMANDS),
+                bot.set_my_description(_DESCRIPTION),
+                bot.set_my_short_description(_SHORT_DESCRIPTION),
+                bot.get_me(),
+            )
+
         logger.info("✅ Bot commands set successfully!")
-        
-        # Set bot description
-        await bot.set_my_description(
-            f"🤖 Advanced Telegram Bot by {config.BOT_OWNER_NAME}\n\n"
-            "🔥 Features:\n"
-            "• AI Assistant powered by Gemini\n"
-            "• File Management & Storage\n" 
-            "• Content Moderation & Security\n"
-            "• Automatic URL Scanning\n"
-            "• Admin Management Tools\n"
-            "• Bad Word Filtering\n\n"
-            "Ready to assist you! 🚀"
-        )
         logger.info("✅ Bot description set successfully!")
-        
-        # Set bot short description
-        await bot.set_my_short_description(
-            f"🤖 Advanced Bot by {config.BOT_OWNER_NAME} - AI Assistant, File Management, Security & More!"
-        )
         logger.info("✅ Bot short description set successfully!")
-        
-        # Get bot info to verify
-        bot_info = await bot.get_me()
         logger.info(f"✅ Bot setup complete for: @{bot_info.username}")
-        
+
         print("🎉 Bot commands setup completed successfully!")
         print("\n📋 Commands registered:")
-        for cmd in commands:
+        for cmd in _COMMANDS:
             print(f"/{cmd.command} - {cmd.description}")
-            
+
         print(f"\n🤖 Bot: @{bot_info.username}")
         print(f"👑 Owner: {config.BOT_OWNER_NAME}")
         print("✅ All automatic setup completed!")
-        
+
     except Exception as e:
         logger.error(f"❌ Error setting up bot commands: {e}")
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(setup_bot_commands())
\ No newline at end of file
+    asyncio.run(setup_bot_commands())
@@ -1,69 +1,209 @@
 import httpx
 import asyncio
+import math
+import re
+from cachetools import TTLCache
+from urllib.parse import urlsplit
 from config import config
+from jit_utils import maybe_njit
 import logging
 from typing import Dict, Any
 
+# URL extraction pattern, compiled once at import. The character class
+# is deliberately flat - no nested quantifiers - so matching is linear
+# and pathological inputs can't trigger catastrophic backtracking.
+_URL_PATTERN = re.compile(r'https?://[^\s<>"\']+', re.IGNORECASE)
+
+@maybe_njit(cache=True)
+def _entropy_from_counts(counts, total):
+    """Shannon entropy in bits from a character-count table"""
+    entropy = 0.0
+    for count in counts:
+        if count:
+            p = count / total
+            entropy -= p * math.log2(p)
+    return entropy
+
+def char_entropy(text: str) -> float:
+    """Shannon entropy of a string's byte distribution"""
+    data = text.encode('utf-8', 'ignore')
+    if not data:
+        return 0.0
+    counts = [0] * 256
+    for byte in data:
+        counts[byte] += 1
+    return _entropy_from_counts(counts, len(data))
+
 class URLScanner:
-    def __init__(self):
+    def __init__(self, http: httpx.AsyncClient = None):
         """Initialize URL scanner with urlscan.io API"""
         self.api_key = config.URLSCAN_API_KEY
         self.base_url = "https://urlscan.io/api/v1"
         self.logger = logging.getLogger(__name__)
 
+        # Reuse one pooled client across scans so each request rides an
+        # existing keep-alive connection instead of a fresh handshake
+        self._owns_http = http is None
+        self.http = http or httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+            # Connect-level failures (DNS hiccup, dropped keep-alive)
+            # are retried inside the transport before we ever see them
+            transport=httpx.AsyncHTTPTransport(retries=2)
+        )
+
+        # Cache scan verdicts so reposted URLs skip the remote round
+        # trip; dangerous verdicts are stable, so they live a full day
+        # while safe ones refresh hourly
+        self.scan_cache = TTLCache(maxsize=10_000, ttl=3600)
+        self.risk_cache = TTLCache(maxsize=2_048, ttl=86_400)
+        self._scan_locks = {}
+
+        # Prime the (optional) JIT compilation at startup instead of on
+        # the first scanned URL
+        char_entropy("warmup")
+
+    async def aclose(self):
+        """Release the pooled connections if this scanner owns them
+
+        Injected clients belong to the bot, which closes them itself
+        on shutdown.
+        """
+        if self._owns_http:
+            await self.http.aclose()
+
+    def looks_suspicious(self, url: str) -> bool:
+        """Heuristic check: high byte entropy suggests a generated URL"""
+        parts = urlsplit(url)
+        return char_entropy(parts.netloc + parts.path) > 4.2
+
+    def _normalize_url(self, url: str) -> str:
+        """Normalize a URL into a stable cache key"""
+        return urlsplit(url).geturl().lower().rstrip('/')
+
     async def scan_url(self, url: str) -> Dict[str, Any]:
-        """Scan URL using urlscan.io API"""
+        """Scan URL using urlscan.io API, serving repeats from the cache"""
+        cache_key = self._normalize_url(url)
+
+        cached = self._cache_lookup(cache_key)
+        if cached is not None:
+            return cached
+
+        # Per-key lock so concurrent scans of the same URL only hit the
+        # API once
+        lock = self._scan_locks.setdefault(cache_key, asyncio.Lock())
+        async with lock:
+            cached = self._cache_lookup(cache_key)
+            if cached is not None:
+                return cached
+
+            result = await self._scan_url_remote(url)
+
+            # Only cache definitive verdicts, not scanner outages
+            risk = result.get('risk_level')
+            if risk in ('high', 'medium'):
+                self.risk_cache[cache_key] = result
+            elif risk != 'unknown':
+                self.scan_cache[cache_key] = result
+
+            self._scan_locks.pop(cache_key, None)
+            return result
+
+    def _cache_lookup(self, cache_key: str):
+        """Check both verdict tiers for a cached scan"""
+        cached = self.risk_cache.get(cache_key)
+        if cached is None:
+            cached = self.scan_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+        return None
+
+    async def _request_with_retry(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Issue a request, absorbing transient 429/5xx with backoff
+
+        A single throttle response no longer turns into an "unknown"
+        verdict: 429 waits for Retry-After (capped at 10s) and 5xx
+        backs off exponentially. The final response is returned once
+        retries are exhausted so callers still see the real status.
+        """
+        response = await self.http.request(method, url, **kwargs)
+        for delay in (0.5, 1, 2):
+            if response.status_code == 429:
+                try:
+                    delay = min(float(response.headers.get('Retry-After', delay)), 10)
+                except ValueError:
+                    pass
+            elif response.status_code < 500:
+                return response
+            await asyncio.sleep(delay)
+            response = await self.http.request(method, url, **kwargs)
+        return response
+
+    async def _scan_url_remote(self, url: str) -> Dict[str, Any]:
+        """Submit a URL to urlscan.io and fetch the verdict"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Submit URL for scanning
-                headers = {
-                    'API-Key': self.api_key,
-                    'Content-Type': 'application/json'
-                }
-                
-                data = {
-                    'url': url,
-                    'visibility': 'private'
-                }
-                
-                # Submit scan
-                response = await client.post(
-                    f"{self.base_url}/scan/",
-                    json=data,
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    scan_result = response.json()
-                    scan_uuid = scan_result['uuid']
-                    
-                    # Wait for scan to complete
-                    await asyncio.sleep(10)  # Wait for scan processing
-                    
-                    # Get scan results
-                    result_response = await client.get(
-                        f"{self.base_url}/result/{scan_uuid}/",
+            # Submit URL for scanning
+            headers = {
+                'API-Key': self.api_key,
+                'Content-Type': 'application/json'
+            }
+
+            data = {
+                'url': url,
+                'visibility': 'private'
+            }
+
+            # Submit scan
+            response = await self._request_with_retry(
+                "POST", f"{self.base_url}/scan/",
+                json=data,
+                headers=headers
+            )
+
+            if response.status_code == 200:
+                scan_result = response.json()
+                scan_uuid = scan_result['uuid']
+
+                # Poll with backoff instead of one fixed 10s sleep -
+                # fast scans return in a couple of seconds, slow ones
+                # get up to ~20s before we give up
+                for delay in (2, 2, 3, 5, 8):
+                    await asyncio.sleep(delay)
+
+                    result_response = await self._request_with_retry(
+                        "GET", f"{self.base_url}/result/{scan_uuid}/",
                         headers={'API-Key': self.api_key}
                     )
-                    
+
                     if result_response.status_code == 200:
-                        result_data = result_response.json()
-                        return self._analyze_scan_result(result_data)
-                    else:
-                        return {
-                            'is_safe': True,
-                            'risk_level': 'unknown',
-                            'message': 'Scan results not available yet'
-                        }
-                else:
-                    return {
-                        'is_safe': True,
-                        'risk_level': 'unknown',
-                        'message': 'Failed to submit URL for scanning'
-                    }
-                    
+                        return self._analyze_scan_result(result_response.json())
+                    if result_response.status_code != 404:
+                        # 404 just means "still scanning"; anything
+                        # else is a real failure
+                        break
+
+                return {
+                    'is_safe': True,
+                    'risk_level': 'unknown',
+                    'message': 'Scan results not available yet'
+                }
+            else:
+                return {
+                    'is_safe': True,
+                    'risk_level': 'unknown',
+                    'message': 'Failed to submit URL for scanning'
+                }
+
         except Exception as e:
             self.logger.error(f"URL scan error: {e}")
+            # Scanner outage: fall back to the local entropy heuristic
+            # so random-looking URLs are at least surfaced
+            if self.looks_suspicious(url):
+                return {
+                    'is_safe': True,
+                    'risk_level': 'low',
+                    'message': 'Scanner unavailable - URL looks machine-generated, proceed with caution'
+                }
             return {
                 'is_safe': True,
                 'risk_level': 'unknown',
@@ -117,6 +257,4 @@ class URLScanner:
 
     def extract_urls_from_text(self, text: str) -> list:
         """Extract URLs from text message"""
-        import re
-        url_pattern = r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.])*)?(?:#(?:[\w.])*)?)?'
-        return re.findall(url_pattern, text, re.IGNORECASE)
\ No newline at end of file
+        return _URL_PATTERN.findall(text)
\ No newline at end of file
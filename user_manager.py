@@ -1,50 +1,155 @@
-import json
+import asyncio
+import orjson
+from cachetools import TTLCache
+from datetime import datetime, timezone
 from telegram import Bot, ChatMember
+from telegram.error import NetworkError
 from config import config
 import logging
 from typing import Dict, List, Optional
 
+_TS_FMT = "%Y-%m-%d %H:%M:%S UTC"
+
+# Audit message templates built once at import - each event is a
+# single format_map call instead of chained f-string concatenations
+_USER_DATA_TMPL = "👤 **User Data**\n" \
+                  "**User ID:** `{user_id}`\n" \
+                  "**Username:** @{username}\n" \
+                  "**First Name:** {first_name}\n" \
+                  "**Data:** ```json\n{data}```"
+
+_ADMIN_ACTION_TMPL = "👑 **Admin Action**\n" \
+                     "**User ID:** `{user_id}`\n" \
+                     "**Action:** {action}\n" \
+                     "**Timestamp:** {ts}"
+
+_USER_ACTION_TMPL = "⚖️ **User Action**\n" \
+                    "**User ID:** `{user_id}`\n" \
+                    "**Action:** {action}\n" \
+                    "**Admin ID:** `{admin_id}`\n" \
+                    "**Timestamp:** {ts}"
+
 class UserManager:
+    """Admin, ban and audit bookkeeping around an injected Bot
+
+    The Bot comes from the application builder, which gives it separate
+    HTTPX pools for API calls and getUpdates - sends issued here
+    (bans, audit messages, subscription checks) can't be starved by
+    long polling holding every connection.
+    """
+
     def __init__(self, bot: Bot):
         """Initialize user manager"""
         self.bot = bot
         self.logger = logging.getLogger(__name__)
-        self.admins = set([config.ADMIN_ID, config.OWNER_ID])
+        # Membership lives in process memory so authorization checks are
+        # plain set/int lookups with no IO behind them
+        self.owner_id = config.OWNER_ID
+        self.admins = frozenset((config.ADMIN_ID, config.OWNER_ID))
         self.banned_users = set()
-        
-    async def is_admin(self, user_id: int) -> bool:
-        """Check if user is admin"""
+
+        # Audit lines are coalesced by a background worker instead of
+        # each costing a send_message on the caller's critical path
+        self._audit_queue = asyncio.Queue()
+        self._audit_task = None
+
+        # Subscription verdicts cached per (channel, user) so repeated
+        # gate checks skip the getChatMember round trip. Memberships are
+        # sticky, so hits live 5 minutes; "not subscribed" is rechecked
+        # after 30s so a fresh join unblocks the user promptly
+        self._sub_hit_cache = TTLCache(maxsize=10_000, ttl=300)
+        self._sub_miss_cache = TTLCache(maxsize=10_000, ttl=30)
+
+    async def _call_with_retry(self, fn, *args, attempts=3, base=0.5, **kwargs):
+        """Retry a Bot call through transient network failures
+
+        NetworkError (which includes TimedOut) usually means a pool
+        timeout or dropped connection; backing off 0.5/1/2s recovers
+        the action instead of silently dropping a ban or audit event.
+        The final failure still propagates so callers keep their
+        existing error handling.
+        """
+        for attempt in range(attempts):
+            try:
+                return await fn(*args, **kwargs)
+            except NetworkError:
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(base * (2 ** attempt))
+
+    def _enqueue_audit(self, text: str):
+        """Queue an audit line for the batching sender
+
+        The caller returns immediately; whatever accumulates within a
+        second is joined into one send_message, so a burst of admin
+        actions costs one API call instead of one each. The worker is
+        started lazily because the manager is constructed before the
+        event loop exists.
+        """
+        self._audit_queue.put_nowait(text)
+        if self._audit_task is None or self._audit_task.done():
+            self._audit_task = asyncio.get_running_loop().create_task(self._audit_worker())
+
+    async def _audit_worker(self):
+        """Drain the audit queue, packing events up to the message limit"""
+        while True:
+            batch = [await self._audit_queue.get()]
+            # Give a burst a moment to accumulate before sending
+            await asyncio.sleep(1)
+            while not self._audit_queue.empty():
+                batch.append(self._audit_queue.get_nowait())
+
+            while batch:
+                text = batch.pop(0)
+                while batch and len(text) + 2 + len(batch[0]) <= 4096:
+                    text += "\n\n" + batch.pop(0)
+                try:
+                    await self._call_with_retry(
+                        self.bot.send_message,
+                        chat_id=config.USER_DATA_SAVE_CHANNEL_ID,
+                        text=text
+                    )
+                except Exception as e:
+                    self.logger.error(f"Audit send error: {e}")
+
+    def is_admin(self, user_id: int) -> bool:
+        """Check if user is admin
+
+        Plain def: the check is a frozenset probe with no IO behind
+        it, so there is nothing to await and no reason to pay
+        coroutine scheduling on every command.
+        """
         return user_id in self.admins
-    
-    async def is_owner(self, user_id: int) -> bool:
+
+    def is_owner(self, user_id: int) -> bool:
         """Check if user is owner"""
-        return user_id == config.OWNER_ID
-    
+        return user_id == self.owner_id
+
     async def add_admin(self, user_id: int, added_by: int) -> bool:
         """Add new admin (only owner can do this)"""
-        if added_by != config.OWNER_ID:
+        if added_by != self.owner_id:
             return False
-        
-        self.admins.add(user_id)
+
+        self.admins = frozenset(self.admins | {user_id})
         await self._save_admin_data(user_id, "added")
         return True
-    
+
     async def remove_admin(self, user_id: int, removed_by: int) -> bool:
         """Remove admin (only owner can do this)"""
-        if removed_by != config.OWNER_ID or user_id == config.OWNER_ID:
+        if removed_by != self.owner_id or user_id == self.owner_id:
             return False
-        
-        self.admins.discard(user_id)
+
+        self.admins = frozenset(self.admins - {user_id})
         await self._save_admin_data(user_id, "removed")
         return True
     
     async def ban_user(self, user_id: int, chat_id: int, admin_id: int) -> bool:
         """Ban user from chat"""
         try:
-            if not await self.is_admin(admin_id):
+            if not self.is_admin(admin_id):
                 return False
             
-            await self.bot.ban_chat_member(chat_id, user_id)
+            await self._call_with_retry(self.bot.ban_chat_member, chat_id, user_id)
             self.banned_users.add(user_id)
             await self._save_user_action(user_id, "banned", admin_id)
             return True
@@ -56,10 +161,10 @@ class UserManager:
     async def unban_user(self, user_id: int, chat_id: int, admin_id: int) -> bool:
         """Unban user from chat"""
         try:
-            if not await self.is_admin(admin_id):
+            if not self.is_admin(admin_id):
                 return False
             
-            await self.bot.unban_chat_member(chat_id, user_id, only_if_banned=True)
+            await self._call_with_retry(self.bot.unban_chat_member, chat_id, user_id, only_if_banned=True)
             self.banned_users.discard(user_id)
             await self._save_user_action(user_id, "unbanned", admin_id)
             return True
@@ -70,65 +175,69 @@ class UserManager:
     
     async def check_subscription(self, user_id: int, channel_username: str) -> bool:
         """Check if user is subscribed to required channel"""
+        key = (channel_username, user_id)
+        if key in self._sub_hit_cache:
+            return True
+        if key in self._sub_miss_cache:
+            return False
+
         try:
-            member = await self.bot.get_chat_member(channel_username, user_id)
-            return member.status in [ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER]
-            
+            member = await self._call_with_retry(self.bot.get_chat_member, channel_username, user_id)
+            subscribed = member.status in [ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER]
+
         except Exception as e:
+            # Outages aren't cached - the next check gets a fresh try
             self.logger.error(f"Subscription check error: {e}")
             return False
+
+        (self._sub_hit_cache if subscribed else self._sub_miss_cache)[key] = True
+        return subscribed
     
     async def save_user_data(self, user_data: dict):
         """Save user data to storage channel"""
         try:
-            data_text = f"👤 **User Data**\n" \
-                       f"**User ID:** `{user_data.get('user_id')}`\n" \
-                       f"**Username:** @{user_data.get('username', 'N/A')}\n" \
-                       f"**First Name:** {user_data.get('first_name', 'N/A')}\n" \
-                       f"**Data:** ```json\n{json.dumps(user_data, indent=2)}```"
-            
-            await self.bot.send_message(
-                chat_id=config.USER_DATA_SAVE_CHANNEL_ID,
-                text=data_text
-            )
-            
+            data_text = _USER_DATA_TMPL.format_map({
+                "user_id": user_data.get('user_id'),
+                "username": user_data.get('username', 'N/A'),
+                "first_name": user_data.get('first_name', 'N/A'),
+                "data": orjson.dumps(user_data, option=orjson.OPT_INDENT_2).decode(),
+            })
+
+            self._enqueue_audit(data_text)
+
         except Exception as e:
             self.logger.error(f"Save user data error: {e}")
     
     async def _save_admin_data(self, user_id: int, action: str):
         """Save admin action to user data channel"""
         try:
-            admin_text = f"👑 **Admin Action**\n" \
-                        f"**User ID:** `{user_id}`\n" \
-                        f"**Action:** {action}\n" \
-                        f"**Timestamp:** {self._get_timestamp()}"
-            
-            await self.bot.send_message(
-                chat_id=config.USER_DATA_SAVE_CHANNEL_ID,
-                text=admin_text
-            )
-            
+            admin_text = _ADMIN_ACTION_TMPL.format_map({
+                "user_id": user_id,
+                "action": action,
+                "ts": self._get_timestamp(),
+            })
+
+            self._enqueue_audit(admin_text)
+
         except Exception as e:
             self.logger.error(f"Save admin data error: {e}")
     
     async def _save_user_action(self, user_id: int, action: str, admin_id: int):
         """Save user moderation action"""
         try:
-            action_text = f"⚖️ **User Action**\n" \
-                         f"**User ID:** `{user_id}`\n" \
-                         f"**Action:** {action}\n" \
-                         f"**Admin ID:** `{admin_id}`\n" \
-                         f"**Timestamp:** {self._get_timestamp()}"
-            
-            await self.bot.send_message(
-                chat_id=config.USER_DATA_SAVE_CHANNEL_ID,
-                text=action_text
-            )
-            
+            action_text = _USER_ACTION_TMPL.format_map({
+                "user_id": user_id,
+                "action": action,
+                "admin_id": admin_id,
+                "ts": self._get_timestamp(),
+            })
+
+            self._enqueue_audit(action_text)
+
         except Exception as e:
             self.logger.error(f"Save user action error: {e}")
     
     def _get_timestamp(self) -> str:
-        """Get current timestamp"""
-        from datetime import datetime
-        return datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
\ No newline at end of file
+        """Get current UTC timestamp"""
+        # Actually use UTC - the old local-time value was labelled UTC
+        return datetime.now(timezone.utc).strftime(_TS_FMT)
\ No newline at end of file